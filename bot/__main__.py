@@ -1,14 +1,25 @@
 #!/usr/bin/env python
 from dotenv import dotenv_values
-from pytumblr2 import TumblrRestClient
-from typing import Any
+from typing import Any, Optional
 from datetime import datetime
+from functools import partial
+import asyncio
+import os
+import yaml
 
-from config import Config
-from format import strip_html
+from archive import DivisionArchive
+from bill_tracker import BillTracker, StagePost
+from blog import Blog
+from config import HOUSES
+from format import html_to_npf
+from lease import Lease, SqliteLeaseStore, holder_id
+from store import VoteStore
+from tumblr_client import TumblrClient
 from vote import VotePoster
 import vote
 import gov.bills
+import gov.cache
+import gov.request
 import gov.divisions.commons
 import gov.divisions.lords
 import gov.members
@@ -19,41 +30,72 @@ def missing_error() -> Any:
 
 
 env = dotenv_values()
-client = TumblrRestClient(
-    consumer_key=env['CONSUMER_KEY'] or missing_error(),
-    consumer_secret=env['CONSUMER_SECRET'] or missing_error(),
-    oauth_token=env['TOKEN'] or missing_error(),
-    oauth_secret=env['TOKEN_SECRET'] or missing_error()
-)
 
-blog = env['BLOG'] or missing_error()
-config_post_id = int(env['CONFIG_POST_ID'] or missing_error())
+vote_store_dir = env.get('VOTE_STORE_DIR')
+show_rebels = bool(env.get('SHOW_REBELS'))
+digest = bool(env.get('DIGEST'))
+houses = (env.get('HOUSES') or 'Commons,Lords').split(',')
+lease_ttl = float(env.get('LEASE_TTL') or 300.0)
+# Set for a single run after LEASE_DB has been wiped or moved, once nothing
+# else is still posting under the old one
+advance_fences = bool(env.get('ADVANCE_LEASE_FENCES'))
+bill_tracker_file = env.get('BILL_TRACKER_FILE')
 
-config = Config(client, blog, config_post_id)
+
+def blog_settings() -> list[dict]:
+    # Either a YAML list of blogs, each with the same keys as Blog.load,
+    # or just the one blog from BLOG and CONFIG_POST_ID
+    blogs_file = env.get('BLOGS_FILE')
+    if blogs_file:
+        with open(blogs_file) as f:
+            return yaml.load(f, Loader=yaml.SafeLoader)
+
+    return [{
+        'blog': env['BLOG'] or missing_error(),
+        'config_post_id': int(env['CONFIG_POST_ID'] or missing_error()),
+    }]
+
+
+# Opened in main(), since render processes import this module again
+division_archive: Optional[DivisionArchive] = None
+
+
+def open_store(house: str) -> Optional[VoteStore]:
+    if not vote_store_dir:
+        return None
+
+    return VoteStore(os.path.join(vote_store_dir, house.lower()))
 
 
 class CommonsVotePoster(VotePoster):
     house = 'Commons'
 
-    def __init__(self, blog: str, client: TumblrRestClient, config: Config):
-        self.blog = blog
-        self.client = client
-        self.config = config
+    def __init__(self, blogs: list[Blog]):
+        self.blogs = blogs
+        self.store = open_store(self.house)
+        self.show_rebels = show_rebels
         self.members_total = gov.members.total_members_commons()
 
-    @property
-    def last_id(self) -> int:
-        return self.config.last_commons_vote
-
-    @last_id.setter
-    def last_id(self, value: int) -> None:
-        self.config.last_commons_vote = value
+    def current_members(self) -> list[gov.members.Member]:
+        return gov.members.current_members(1)
 
-    def division_page(self, size: int, offset: int) -> list[vote.Div]:
+    def division_page(self, size: int, offset: int) -> list[vote.LazyDiv]:
         page = gov.divisions.commons.search(take=size, skip=offset)
-        page = [gov.divisions.commons.get(div['DivisionId']) for div in page]
 
-        return [vote.Div(
+        return [vote.LazyDiv(
+            id=div['DivisionId'],
+            date=datetime.fromisoformat(div['Date']),
+            load=partial(self._load_div, div['DivisionId']),
+        ) for div in page]
+
+    def _load_div(self, id: int) -> vote.Div:
+        div = division_archive.get('commons', id) if division_archive else None
+        if div is None:
+            div = gov.divisions.commons.get(id)
+            if division_archive:
+                division_archive.put('commons', id, div)
+
+        return vote.Div(
             id=div['DivisionId'],
             title_prefix='On: ',
             title=div['Title'],
@@ -63,13 +105,14 @@ class CommonsVotePoster(VotePoster):
             no=self._parse_members(div['Noes']),
             no_count=div['NoCount'],
             date=datetime.fromisoformat(div['Date']),
-        ) for div in page]
+        )
 
     def _parse_members(
         self,
         members: list[gov.divisions.commons.Member]
     ) -> list[vote.Member]:
         return [vote.Member(
+            id=member['MemberId'],
             name=member['Name'],
             sortName=member['Name'],
             party=member['Party'],
@@ -83,40 +126,46 @@ class CommonsVotePoster(VotePoster):
 class LordsVotePoster(VotePoster):
     house = 'Lords'
 
-    def __init__(self, blog: str, client: TumblrRestClient, config: Config):
-        self.blog = blog
-        self.client = client
-        self.config = config
+    def __init__(self, blogs: list[Blog]):
+        self.blogs = blogs
+        self.store = open_store(self.house)
+        self.show_rebels = show_rebels
         self.members_total = gov.members.total_members_lords()
 
-    @property
-    def last_id(self) -> int:
-        return self.config.last_lords_vote
-
-    @last_id.setter
-    def last_id(self, value: int) -> None:
-        self.config.last_lords_vote = value
+    def current_members(self) -> list[gov.members.Member]:
+        return gov.members.current_members(2)
 
-    def division_page(self, size: int, offset: int) -> list[vote.Div]:
+    def division_page(self, size: int, offset: int) -> list[vote.LazyDiv]:
         page = gov.divisions.lords.search(take=size, skip=offset)
+        if division_archive:
+            for div in page:
+                division_archive.put('lords', div['divisionId'], div)
+
+        return [vote.LazyDiv(
+            id=div['divisionId'],
+            date=datetime.fromisoformat(div['date']),
+            load=partial(self._load_div, div),
+        ) for div in page]
 
-        return [vote.Div(
+    def _load_div(self, div: gov.divisions.lords.Division) -> vote.Div:
+        return vote.Div(
             id=div['divisionId'],
             title_prefix='On: ',
             title=div['title'],
-            desc=strip_html(div['amendmentMotionNotes']),
+            desc=html_to_npf(div['amendmentMotionNotes']),
             yes=self._parse_members(div['contents']),
             yes_count=div['authoritativeContentCount'],
             no=self._parse_members(div['notContents']),
             no_count=div['authoritativeNotContentCount'],
             date=datetime.fromisoformat(div['date']),
-        ) for div in page]
+        )
 
     def _parse_members(
         self,
         members: list[gov.divisions.lords.Member]
     ) -> list[vote.Member]:
         return [vote.Member(
+            id=member['memberId'],
             name=member['listAs'],
             sortName=member['listAs'],
             party=member['party'],
@@ -127,12 +176,163 @@ class LordsVotePoster(VotePoster):
         return 'https://votes.parliament.uk/votes/lords/division/' + str(id)
 
 
+async def post_house(poster: VotePoster) -> None:
+    if digest:
+        await poster.post_digest()
+    else:
+        await poster.post()
+
+    print('====>', poster.house, 'done')
+
+
+async def post_bill_stages(blogs: list[Blog],
+                           leases: Optional[SqliteLeaseStore],
+                           lease: Optional[Lease]) -> None:
+    assert bill_tracker_file
+
+    async def check_lease() -> None:
+        # As with VotePoster.check_lease, stop before posting if another
+        # instance has taken over since, which it may have done while the
+        # houses were posting
+        nonlocal lease
+        if leases and lease:
+            lease = await asyncio.to_thread(leases.renew, lease, lease_ttl)
+
+    await check_lease()
+    tracker = BillTracker(bill_tracker_file)
+    await asyncio.to_thread(tracker.poll, [blog.name for blog in blogs])
+
+    for blog in blogs:
+        changes = tracker.pending(blog.name)
+        for change in changes:
+            if not blog.try_reserve(1):
+                print(f'\t{blog.name}: out of posts for this run')
+                break
+
+            await check_lease()
+            await blog.create_post(StagePost(change).render(), ['bill update'])
+            tracker.posted(blog.name)
+
+        print('====>', blog.name, 'bill stages done,', len(changes), 'changes')
+
+
+async def main() -> None:
+    global division_archive
+    if env.get('ARCHIVE_DIR'):
+        division_archive = DivisionArchive(env['ARCHIVE_DIR'])
+
+    gov.cache.configure(
+        maxsize=int(env['MEMO_SIZE']) if env.get('MEMO_SIZE') else None,
+        ttl=float(env['MEMO_TTL']) if env.get('MEMO_TTL') else None,
+    )
+
+    client = TumblrClient(
+        consumer_key=env['CONSUMER_KEY'] or missing_error(),
+        consumer_secret=env['CONSUMER_SECRET'] or missing_error(),
+        oauth_token=env['TOKEN'] or missing_error(),
+        oauth_secret=env['TOKEN_SECRET'] or missing_error()
+    )
+
+    # Take each house's lease before reading any config, so the cursors
+    # read are ones nobody else is about to move
+    leases = SqliteLeaseStore(env['LEASE_DB']) if env.get('LEASE_DB') else None
+    if leases is None and set(houses) != set(HOUSES):
+        # Without leases every save writes back both houses' cursors, so
+        # splitting houses across instances would have them undo each other
+        raise Exception('HOUSES needs LEASE_DB set to post only some houses')
+
+    holder = holder_id()
+    held: dict[str, Optional[Lease]] = {}
+    for house in houses:
+        lease = None
+        if leases:
+            lease = leases.acquire('house:' + house, holder, lease_ttl)
+            if lease is None:
+                print('====>', house, 'is being posted by another instance')
+                continue
+
+        held[house] = lease
+
+    bills_lease: Optional[Lease] = None
+    track_bills = bool(bill_tracker_file)
+    if track_bills and leases:
+        bills_lease = leases.acquire('bills', holder, lease_ttl)
+        if bills_lease is None:
+            print('====> bill stages are being posted by another instance')
+            track_bills = False
+
+    try:
+        async with client:
+            blogs = await asyncio.gather(*(
+                Blog.load(client, **settings) for settings in blog_settings()
+            ))
+
+            if leases and advance_fences:
+                # A fence already in a config post that's ahead of the lease
+                # can only be told apart from another instance using its own
+                # LEASE_DB by whoever runs the bot, so this only happens
+                # when asked for
+                for house, lease in held.items():
+                    stored = max((blog.config.stored_fence(house)
+                                  for blog in blogs if house in blog.houses),
+                                 default=0)
+                    if lease and stored >= lease.token:
+                        print('====>', house, 'lease token behind config,',
+                              'advancing to', stored + 1)
+                        held[house] = leases.advance(lease, stored + 1)
+
+            if leases:
+                for blog in blogs:
+                    blog.config.coordinate(leases, holder, dict(
+                        (house, lease.token) for house, lease in held.items()
+                        if lease and house in blog.houses
+                    ))
+
+            # TODO: look into why some bills seem to be missing for the
+            # commons eg. 1825, 1826
+            # TODO: look into why some bills seem to be missing for the lords
+            # eg. 3124, 3127
+            posters = await asyncio.gather(*(
+                asyncio.to_thread(poster_type, [
+                    blog for blog in blogs if poster_type.house in blog.houses
+                ])
+                for poster_type in (CommonsVotePoster, LordsVotePoster)
+                if poster_type.house in held
+            ))
+
+            for poster in posters:
+                poster.leases = leases
+                poster.lease = held[poster.house]
+                poster.lease_ttl = lease_ttl
+
+            # Both houses finish what they're doing before a failure in
+            # either closes the client and releases the leases under them
+            results = await asyncio.gather(*(
+                post_house(poster) for poster in posters if poster.blogs
+            ), return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+
+            bill_blogs = [blog for blog in blogs if blog.bill_stages]
+            if track_bills and bill_blogs:
+                await post_bill_stages(bill_blogs, leases, bills_lease)
+    finally:
+        if leases:
+            for lease in [*held.values(), bills_lease]:
+                if lease:
+                    leases.release(lease)
+
+    vote.shutdown_render_pool()
+
+    for name, stats in gov.cache.stats().items():
+        print('cache', name, stats)
+
+    for host, state in gov.request.limits().items():
+        print('concurrency', host, 'limit {:.1f}'.format(state.limit),
+              'decisions', [(d.reason, round(d.limit, 1))
+                            for d in state.decisions[-5:]])
+
+
 if __name__ == '__main__':
-    # TODO: look into why some bills seem to be missing for the commons
-    # eg. 1825, 1826
-    print('====> Commons')
-    CommonsVotePoster(blog, client, config).post()
-    # TODO: look into why some bills seem to be missing for the lords
-    # eg. 3124, 3127
-    print('====> Lords')
-    LordsVotePoster(blog, client, config).post()
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+from typing import Any, NamedTuple, Optional
+import json
+import mmap
+import os
+import threading
+import zlib
+
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+
+class ArchiveEntry(NamedTuple):
+    house: str
+    id: int
+    segment: int
+    offset: int
+    length: int
+
+
+class DivisionArchive:
+    """
+    Raw division payloads as fetched from the parliament APIs, each stored
+    as a zlib compressed JSON record appended to the current segment file.
+
+    index.jsonl maps (house, division id) to the segment, offset and length
+    of the record, so reading one back is a single slice of the segment's
+    memory map and a decompress. Re-archiving a changed payload appends a
+    new record, and the latest index entry wins. compact() drops the
+    records that have been superseded.
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        self._path = path
+        self._index_path = os.path.join(path, 'index.jsonl')
+        self._lock = threading.RLock()
+        self._maps: dict[int, mmap.mmap] = {}
+
+        self._entries: dict[tuple[str, int], ArchiveEntry] = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                for line in f:
+                    entry = ArchiveEntry(**json.loads(line))
+                    self._entries[(entry.house, entry.id)] = entry
+
+        self._segment = 0
+        self._segment_end = 0
+        for entry in self._entries.values():
+            end = entry.offset + entry.length
+            if entry.segment > self._segment:
+                self._segment = entry.segment
+                self._segment_end = end
+            elif entry.segment == self._segment:
+                self._segment_end = max(self._segment_end, end)
+
+        # Records are only indexed once they're written, so anything after
+        # the last indexed record is a torn write
+        with open(self._segment_path(self._segment), 'ab') as f:
+            f.truncate(self._segment_end)
+
+    def __contains__(self, key: tuple[str, int]) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def put(self, house: str, id: int, payload: Any) -> None:
+        record = zlib.compress(
+            json.dumps(payload, separators=(',', ':')).encode())
+
+        with self._lock:
+            existing = self._entries.get((house, id))
+            if existing and self._read(existing) == record:
+                return
+
+            if self._segment_end + len(record) > SEGMENT_SIZE \
+                    and self._segment_end > 0:
+                self._segment += 1
+                self._segment_end = 0
+
+            entry = ArchiveEntry(
+                house=house,
+                id=id,
+                segment=self._segment,
+                offset=self._segment_end,
+                length=len(record),
+            )
+            self._append(entry, record)
+            with open(self._index_path, 'a') as f:
+                f.write(json.dumps(entry._asdict()) + '\n')
+
+    def get(self, house: str, id: int) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get((house, id))
+            if entry is None:
+                return None
+
+            record = self._read(entry)
+
+        return json.loads(zlib.decompress(record))
+
+    def ids(self, house: str) -> list[int]:
+        return sorted(id for entry_house, id in self._entries
+                      if entry_house == house)
+
+    def compact(self) -> None:
+        with self._lock:
+            live = sorted(self._entries.values(),
+                          key=lambda entry: (entry.segment, entry.offset))
+            records = [(entry, self._read(entry)) for entry in live]
+
+            self._close_maps()
+
+            # New segments are numbered on from the old ones, so nothing
+            # is overwritten until the new index is in place
+            first = self._segment + 1
+            self._segment = first
+            self._segment_end = 0
+            self._entries = {}
+
+            tmp_index_path = self._index_path + '.tmp'
+            with open(tmp_index_path, 'w') as index:
+                for entry, record in records:
+                    if self._segment_end + len(record) > SEGMENT_SIZE \
+                            and self._segment_end > 0:
+                        self._segment += 1
+                        self._segment_end = 0
+
+                    entry = entry._replace(
+                        segment=self._segment, offset=self._segment_end)
+                    self._append(entry, record)
+                    index.write(json.dumps(entry._asdict()) + '\n')
+
+            os.replace(tmp_index_path, self._index_path)
+
+            for name in os.listdir(self._path):
+                if name.startswith('segment-') and name.endswith('.seg') \
+                        and int(name[len('segment-'):-len('.seg')]) < first:
+                    os.remove(os.path.join(self._path, name))
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_maps()
+
+    def _append(self, entry: ArchiveEntry, record: bytes) -> None:
+        # Starting a segment clears out anything left by a compaction that
+        # didn't get as far as swapping the index in
+        mode = 'wb' if entry.offset == 0 else 'ab'
+        with open(self._segment_path(entry.segment), mode) as f:
+            f.write(record)
+
+        # The current segment's map no longer covers the whole file
+        old_map = self._maps.pop(entry.segment, None)
+        if old_map:
+            old_map.close()
+
+        self._entries[(entry.house, entry.id)] = entry
+        self._segment_end = entry.offset + entry.length
+
+    def _read(self, entry: ArchiveEntry) -> bytes:
+        segment_map = self._maps.get(entry.segment)
+        if segment_map is None:
+            with open(self._segment_path(entry.segment), 'rb') as f:
+                segment_map = mmap.mmap(
+                    f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[entry.segment] = segment_map
+
+        return segment_map[entry.offset:entry.offset + entry.length]
+
+    def _close_maps(self) -> None:
+        for segment_map in self._maps.values():
+            segment_map.close()
+        self._maps = {}
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self._path, 'segment-{:05}.seg'.format(segment))
@@ -0,0 +1,188 @@
+from typing import NamedTuple, Optional
+from datetime import datetime
+import json
+import os
+
+from tumblr_neue import NpfContent
+import gov.bills
+
+PAGE_SIZE = 20
+# Enough for a first run to take in every bill still moving through
+# parliament, and for a poll after a long gap to catch up
+MAX_PAGES = 50
+
+
+class TrackedBill(NamedTuple):
+    lastUpdate: str
+    stage: Optional[gov.bills.Stage]
+
+
+class StageChange(NamedTuple):
+    bill: gov.bills.Bill
+    before: gov.bills.Stage
+    after: gov.bills.Stage
+
+
+def _stage_key(stage: Optional[gov.bills.Stage]) -> Optional[tuple]:
+    if stage is None:
+        return None
+
+    return (stage['stageId'], stage['house'])
+
+
+class BillTracker:
+    """
+    A local snapshot of bills and the stage each was last seen at. Polling
+    pages through the bills sorted by most recently updated and stops at
+    the first one that's older than the snapshot's watermark, so a poll
+    costs a request per page of bills that have actually changed.
+
+    Changes found are queued for each blog in the same snapshot, and only
+    leave a blog's queue once posted there, so a failed post or a blog out
+    of posts picks up where it left off next run.
+    """
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self.watermark: Optional[str] = None
+        self.bills: dict[int, TrackedBill] = {}
+        self.queues: dict[str, list[StageChange]] = {}
+
+        if os.path.exists(path):
+            with open(path) as f:
+                snapshot = json.load(f)
+
+            self.watermark = snapshot['watermark']
+            self.bills = dict(
+                (int(id), TrackedBill(**bill))
+                for id, bill in snapshot['bills'].items()
+            )
+            self.queues = dict(
+                (blog, [StageChange(**change) for change in queue])
+                for blog, queue in snapshot.get('queues', {}).items()
+            )
+
+    def poll(self, blogs: list[str]) -> None:
+        watermark = _parse_date(self.watermark) if self.watermark else None
+        updated: list[gov.bills.Bill] = []
+
+        for page in range(MAX_PAGES):
+            items = gov.bills.search(
+                SortOrder='DateUpdatedDescending',
+                Skip=page * PAGE_SIZE,
+                Take=PAGE_SIZE,
+            )['items']
+
+            done = len(items) < PAGE_SIZE
+            for bill in items:
+                if watermark and _parse_date(bill['lastUpdate']) < watermark:
+                    done = True
+                    break
+
+                updated.append(bill)
+
+            if done:
+                break
+
+        changes: list[StageChange] = []
+        for bill in updated:
+            tracked = self.bills.get(bill['billId'])
+            if tracked and tracked.lastUpdate == bill['lastUpdate']:
+                continue
+
+            stage = bill.get('currentStage')
+            self.bills[bill['billId']] = TrackedBill(bill['lastUpdate'], stage)
+
+            # Bills seen for the first time have nothing to compare with
+            if tracked and tracked.stage and stage \
+                    and _stage_key(tracked.stage) != _stage_key(stage):
+                changes.append(StageChange(bill, tracked.stage, stage))
+
+        if updated:
+            newest = max(updated, key=lambda bill: _parse_date(
+                bill['lastUpdate']))
+            self.watermark = newest['lastUpdate']
+
+        # Oldest first, so they get posted in the order they happened
+        changes.reverse()
+        for blog in blogs:
+            self.queues.setdefault(blog, []).extend(changes)
+
+        self._save()
+
+    def pending(self, blog: str) -> list[StageChange]:
+        return list(self.queues.get(blog, []))
+
+    def posted(self, blog: str) -> None:
+        self.queues[blog].pop(0)
+        self._save()
+
+    def _save(self) -> None:
+        tmp_path = self._path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'watermark': self.watermark,
+                'bills': dict(
+                    (str(id), bill._asdict())
+                    for id, bill in self.bills.items()
+                ),
+                'queues': dict(
+                    (blog, [change._asdict() for change in queue])
+                    for blog, queue in self.queues.items()
+                ),
+            }, f)
+        os.replace(tmp_path, self._path)
+
+
+def _parse_date(date: str) -> datetime:
+    return datetime.fromisoformat(date)
+
+
+class StagePost:
+    def __init__(self, change: StageChange) -> None:
+        self.change = change
+        self.content: list[NpfContent] = []
+
+    def render(self) -> list[NpfContent]:
+        bill = self.change.bill
+
+        self.content.append({
+            'type': 'text',
+            'text': 'Bill Update',
+            'subtype': 'heading1',
+        })
+
+        BILL_PREFIX = 'Bill: '
+        bill_name = BILL_PREFIX + bill['shortTitle']
+        self.content.append({
+            'type': 'text',
+            'text': bill_name,
+            'formatting': [
+                {
+                    'start': len(BILL_PREFIX),
+                    'end': len(bill_name),
+                    'type': 'italic',
+                },
+                {
+                    'start': len(BILL_PREFIX),
+                    'end': len(bill_name),
+                    'type': 'link',
+                    'url':
+                    'https://bills.parliament.uk/bills/' + str(bill['billId'])
+                },
+            ]
+        })
+
+        self.content.append({
+            'type': 'text',
+            'text': '\n'.join([
+                'Previous stage: {}'.format(self._stage(self.change.before)),
+                'New stage: {}'.format(self._stage(self.change.after)),
+                'Current house: {}'.format(bill['currentHouse']),
+            ]),
+        })
+
+        return self.content
+
+    def _stage(self, stage: gov.bills.Stage) -> str:
+        return '{} ({})'.format(stage['description'], stage['house'])
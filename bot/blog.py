@@ -0,0 +1,92 @@
+from typing import Optional
+
+from config import Config
+from tumblr_client import TumblrClient
+from tumblr_neue import NpfContent
+
+DEFAULT_TAGS = [
+    'uk gov', 'uk politics', 'uk parliament',
+    'politics', 'vote', 'wankerwatch',
+    # 'backdating'
+]
+
+
+class Blog:
+    """
+    A blog that divisions get posted to, with its own config post (and so
+    its own cursor per house), tags and a cap on how many posts it'll make
+    in one run to stay within Tumblr's daily post limit.
+    """
+
+    def __init__(self,
+                 client: TumblrClient,
+                 name: str,
+                 config: Config,
+                 houses: list[str],
+                 tags: list[str],
+                 post_limit: Optional[int],
+                 bill_stages: bool):
+        self.client = client
+        self.name = name
+        self.config = config
+        self.houses = houses
+        self.tags = tags
+        self.post_limit = post_limit
+        self.bill_stages = bill_stages
+        self.posts_made = 0
+
+    @classmethod
+    async def load(cls,
+                   client: TumblrClient,
+                   blog: str,
+                   config_post_id: int,
+                   houses: Optional[list[str]] = None,
+                   tags: Optional[list[str]] = None,
+                   post_limit: Optional[int] = None,
+                   bill_stages: bool = False) -> 'Blog':
+        config = await Config.load(client, blog, config_post_id)
+        return cls(
+            client, blog, config,
+            houses or ['Commons', 'Lords'],
+            tags or DEFAULT_TAGS,
+            post_limit,
+            bill_stages,
+        )
+
+    def last_id(self, house: str) -> int:
+        return self.config.last_vote(house)
+
+    async def set_last_id(self, house: str, value: int) -> None:
+        self.config.set_last_vote(house, value)
+        await self.config.save()
+
+    def try_reserve(self, posts: int) -> bool:
+        # Both houses post to the same blogs at once, so the check and the
+        # count have to happen together, before either gets to await
+        if self.post_limit is not None \
+                and self.posts_made + posts > self.post_limit:
+            return False
+
+        self.posts_made += posts
+        return True
+
+    async def create_post(
+        self,
+        content: list[NpfContent],
+        extra_tags: Optional[list[str]] = None,
+        read_more_index: Optional[int] = None,
+    ) -> None:
+        layout: dict = {
+            'type': 'rows',
+            'display': [{'blocks': [i]} for i in range(len(content))],
+        }
+        if read_more_index is not None:
+            layout['truncate_after'] = read_more_index
+
+        await self.client.create_post(
+            self.name,
+            content=content,
+            tags=self.tags + (extra_tags or []),
+            layout=[layout],
+            # state='queued',
+        )
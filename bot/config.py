@@ -1,28 +1,89 @@
-from pytumblr2 import TumblrRestClient
+from typing import Optional
 from datetime import datetime
+import asyncio
 import yaml
 
+from lease import LeaseLostError, LeaseStore
+from tumblr_client import TumblrClient
 from tumblr_neue import NpfContent
 
+HOUSES = ['Commons', 'Lords']
+
+# How long one instance may hold the config post while it reads, merges
+# and writes it back
+CONFIG_LOCK_TTL = 60.0
+CONFIG_LOCK_TIMEOUT = 120.0
+
+
+def _vote_key(house: str) -> str:
+    return 'last_{}_vote'.format(house.lower())
+
+
+def _fence_key(house: str) -> str:
+    return 'fence_{}'.format(house.lower())
+
 
 class Config:
     _last_commons_vote: int
     _last_lords_vote: int
 
     def __init__(self,
-                 client: TumblrRestClient,
+                 client: TumblrClient,
                  blog: str,
-                 config_post_id: int):
+                 config_post_id: int,
+                 config: dict):
         self._client = client
         self._blog = blog
         self._config_post_id = config_post_id
-
-        config_post = client.get_single_post(blog, config_post_id)
-        content = config_post['content'][0]['text']
-        config = yaml.load(content, Loader=yaml.SafeLoader)
+        self._save_lock = asyncio.Lock()
 
         self._last_commons_vote = config['last_commons_vote']
         self._last_lords_vote = config['last_lords_vote']
+        self._stored_fences = dict(
+            (house, config.get(_fence_key(house), 0)) for house in HOUSES)
+
+        self._leases: Optional[LeaseStore] = None
+        self._holder = ''
+        self._fences: dict[str, int] = {}
+        self._dirty: set[str] = set()
+
+    @classmethod
+    async def load(cls,
+                   client: TumblrClient,
+                   blog: str,
+                   config_post_id: int) -> 'Config':
+        return cls(client, blog, config_post_id,
+                   await cls._fetch(client, blog, config_post_id))
+
+    @staticmethod
+    async def _fetch(client: TumblrClient,
+                     blog: str,
+                     config_post_id: int) -> dict:
+        config_post = await client.get_single_post(blog, config_post_id)
+        content = config_post['content'][0]['text']
+        return yaml.load(content, Loader=yaml.SafeLoader)
+
+    def stored_fence(self, house: str) -> int:
+        return self._stored_fences[house]
+
+    def coordinate(self,
+                   leases: LeaseStore,
+                   holder: str,
+                   fences: dict[str, int]) -> None:
+        # With other instances about, saves only write back the houses this
+        # one holds leases for, tagged with the lease's fencing token so a
+        # save from an instance that's since lost its lease gets refused
+        for house, token in fences.items():
+            if self._stored_fences[house] > token:
+                raise LeaseLostError(
+                    'config for {} already written under a newer lease; '
+                    'if LEASE_DB was wiped or moved and no other instance '
+                    'is running, run once with ADVANCE_LEASE_FENCES=1'
+                    .format(house))
+
+        self._leases = leases
+        self._holder = holder
+        self._fences = fences
 
     @property
     def last_commons_vote(self) -> int:
@@ -31,7 +92,7 @@ class Config:
     @last_commons_vote.setter
     def last_commons_vote(self, value: int) -> None:
         self._last_commons_vote = value
-        self._save()
+        self._dirty.add('Commons')
 
     @property
     def last_lords_vote(self) -> int:
@@ -40,20 +101,74 @@ class Config:
     @last_lords_vote.setter
     def last_lords_vote(self, value: int) -> None:
         self._last_lords_vote = value
-        self._save()
+        self._dirty.add('Lords')
+
+    def last_vote(self, house: str) -> int:
+        if house == 'Commons':
+            return self.last_commons_vote
+
+        return self.last_lords_vote
+
+    def set_last_vote(self, house: str, value: int) -> None:
+        if house == 'Commons':
+            self.last_commons_vote = value
+        else:
+            self.last_lords_vote = value
+
+    async def save(self) -> None:
+        # Both houses share the one config post, so saves go out one at a
+        # time and each writes whatever the latest values are by then
+        async with self._save_lock:
+            if self._leases is None:
+                await self._write(dict(
+                    (_vote_key(house), self.last_vote(house))
+                    for house in HOUSES
+                ))
+                return
+
+            await self._merge_and_write(self._leases)
+
+    async def _merge_and_write(self, leases: LeaseStore) -> None:
+        lock = await asyncio.to_thread(
+            leases.acquire_wait,
+            'config:' + self._blog, self._holder,
+            CONFIG_LOCK_TTL, CONFIG_LOCK_TIMEOUT,
+        )
+        try:
+            remote = await self._fetch(
+                self._client, self._blog, self._config_post_id)
+
+            for house, token in self._fences.items():
+                if remote.get(_fence_key(house), 0) > token:
+                    raise LeaseLostError(
+                        'another instance has taken over {}'.format(house))
+
+            config = dict(remote)
+            for house in HOUSES:
+                if house in self._fences and house in self._dirty:
+                    config[_vote_key(house)] = self.last_vote(house)
+                elif house not in self._fences:
+                    # Pick up where whoever holds the house has got to
+                    self.set_last_vote(house, remote[_vote_key(house)])
+                    self._dirty.discard(house)
+
+            for house, token in self._fences.items():
+                config[_fence_key(house)] = token
+
+            await self._write(config)
+            self._dirty -= set(self._fences)
+        finally:
+            await asyncio.to_thread(leases.release, lock)
 
-    def _save(self) -> None:
-        cfg = yaml.dump({
-            'last_commons_vote': self._last_commons_vote,
-            'last_lords_vote': self._last_lords_vote,
-        })
+    async def _write(self, config: dict) -> None:
+        cfg = yaml.dump(config)
 
         content: list[NpfContent] = [{
             'type': 'text',
             'text': cfg
         }]
 
-        self._client.edit_post(
+        await self._client.edit_post(
             self._blog, self._config_post_id,
             content=content,
             tags=[
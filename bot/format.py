@@ -1,25 +1,167 @@
+from typing import Optional, cast
+from html import unescape
 import re
-from io import StringIO
-from html.parser import HTMLParser
+import threading
 
+from tumblr_neue import NpfTextContent, NpfTextFormatting
 
-class MLStripper(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.reset()
-        self.strict = False
-        self.convert_charrefs = True
-        self.text = StringIO()
+STYLE_TAGS = {
+    'b': 'bold',
+    'strong': 'bold',
+    'i': 'italic',
+    'em': 'italic',
+    's': 'strikethrough',
+    'strike': 'strikethrough',
+    'del': 'strikethrough',
+    'small': 'small',
+}
+PARAGRAPH_TAGS = {'p', 'div', 'li', 'blockquote'}
 
-    def handle_data(self, d):
-        self.text.write(d)
+TOKEN = re.compile(
+    r'<(/?)([a-zA-Z][a-zA-Z0-9]*)([^>]*)>'  # tags
+    r'|<!--.*?-->|<![^>]*>|<\?[^>]*>'  # comments, doctypes etc, all dropped
+    r'|([^<]+|<)',  # text, including any stray '<'
+    re.S,
+)
+HREF = re.compile(r'''href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.I)
+SAFE_URL = re.compile(r'https?://', re.I)
 
-    def get_data(self):
-        return self.text.getvalue()
 
+class NpfConverter:
+    """
+    Turns an HTML fragment into the text and formatting ranges of an NPF
+    text block in a single tokenizing pass, keeping the bold, italic,
+    strikethrough and links that NPF can represent and dropping the rest.
 
-def strip_html(txt: str) -> str:
-    txt = re.sub('<br *?/?>', '\n', txt)
-    s = MLStripper()
-    s.feed(txt)
-    return s.get_data()
+    Formatting offsets are tracked as the text is built, so they always
+    line up with the unescaped text rather than the source HTML.
+    """
+
+    def __init__(self) -> None:
+        self._text: list[str] = []
+        self._len = 0
+        self._break = False
+        self._between = True
+        self._open: list[tuple[str, int, Optional[str]]] = []
+        self._formatting: list[NpfTextFormatting] = []
+
+    def convert(self, html: str) -> NpfTextContent:
+        self._text = []
+        self._len = 0
+        self._break = False
+        self._between = True
+        self._open = []
+        self._formatting = []
+
+        for match in TOKEN.finditer(html):
+            closing, tag, attrs, data = match.groups()
+            if data is not None:
+                # Whitespace between block tags is only the source's layout
+                if self._between and data.isspace():
+                    continue
+
+                self._between = False
+                self._write(unescape(data) if '&' in data else data)
+            elif tag is not None:
+                tag = tag.lower()
+                if closing:
+                    self._end_tag(tag)
+                else:
+                    self._start_tag(tag, attrs)
+
+        # Anything left unclosed runs to the end
+        while self._open:
+            self._close_range(len(self._open) - 1)
+
+        self._formatting.sort(key=lambda item: item['start'])
+
+        content: NpfTextContent = {
+            'type': 'text',
+            'text': ''.join(self._text),
+        }
+        if self._formatting:
+            content['formatting'] = self._formatting
+
+        return content
+
+    def _start_tag(self, tag: str, attrs: str) -> None:
+        # Ranges start after any paragraph break that's still to be written
+        start = self._len + self._break
+        if tag == 'br':
+            self._write('\n')
+        elif tag in PARAGRAPH_TAGS:
+            self._paragraph()
+        elif attrs.endswith('/'):
+            # A self-closed <b/> or <a/> has nothing inside it to style
+            return
+        elif tag in STYLE_TAGS:
+            self._open.append((tag, start, None))
+        elif tag == 'a':
+            href = HREF.search(attrs)
+            url = next((group for group in href.groups()
+                        if group is not None), None) if href else None
+            url = unescape(url or '').strip()
+            # Anything but an absolute web link, like javascript: or a link
+            # relative to a page the post isn't on, is left as plain text
+            if not SAFE_URL.match(url):
+                url = ''
+            self._open.append((tag, start, url))
+
+    def _end_tag(self, tag: str) -> None:
+        if tag in PARAGRAPH_TAGS:
+            self._paragraph()
+            return
+
+        for i in range(len(self._open) - 1, -1, -1):
+            if self._open[i][0] == tag:
+                self._close_range(i)
+                return
+
+    def _write(self, text: str) -> None:
+        if self._break:
+            self._break = False
+            self._text.append('\n')
+            self._len += 1
+
+        self._text.append(text)
+        self._len += len(text)
+
+    def _paragraph(self) -> None:
+        # Held back until there's more text, so paragraphs never leave a
+        # leading, trailing or doubled up line break
+        self._between = True
+        if self._len > 0 and not self._text[-1].endswith('\n'):
+            self._break = True
+
+    def _close_range(self, i: int) -> None:
+        tag, start, url = self._open.pop(i)
+        if start >= self._len:
+            return
+
+        if tag == 'a':
+            if url:
+                self._formatting.append({
+                    'start': start,
+                    'end': self._len,
+                    'type': 'link',
+                    'url': url,
+                })
+            return
+
+        self._formatting.append(cast(NpfTextFormatting, {
+            'start': start,
+            'end': self._len,
+            'type': STYLE_TAGS[tag],
+        }))
+
+
+_converters = threading.local()
+
+
+def html_to_npf(html: str) -> NpfTextContent:
+    # One converter per thread, since houses render in their own threads
+    converter = getattr(_converters, 'converter', None)
+    if converter is None:
+        converter = _converters.converter = NpfConverter()
+
+    return converter.convert(html)
@@ -1,5 +1,6 @@
-import httpx
-from typing import NotRequired, TypedDict, Union, Literal, Unpack, cast, Any
+import gov.cache
+import gov.request
+from typing import NotRequired, TypedDict, Union, Literal, Unpack
 
 BASE_URL = 'https://bills-api.parliament.uk'
 
@@ -54,22 +55,29 @@ class BillsSearchResult(TypedDict):
     itemsPerPage: str
 
 
+BillsSortOrder = Union[
+    Literal['TitleAscending'],
+    Literal['TitleDescending'],
+    Literal['DateUpdatedAscending'],
+    Literal['DateUpdatedDescending'],
+]
+
+
 class BillsSearchParams(TypedDict):
     SearchTerm: NotRequired[str]
+    SortOrder: NotRequired[BillsSortOrder]
     Skip: NotRequired[int]
     Take: NotRequired[int]
 
 
+@gov.cache.memoize('bills.search')
 def search(**params: Unpack[BillsSearchParams]) -> BillsSearchResult:
-    return httpx.get(
+    return gov.request.get(
         BASE_URL + '/api/v1/Bills',
-        params=cast(Any, params),
-        timeout=30.0,
-    ).raise_for_status().json()
+        params=params,
+    )
 
 
+@gov.cache.memoize('bills.get')
 def get(id: int) -> FullBill:
-    return httpx.get(
-        BASE_URL + '/api/v1/Bills/{}'.format(id),
-        timeout=30.0,
-    ).raise_for_status().json()
+    return gov.request.get(BASE_URL + '/api/v1/Bills/{}'.format(id))
@@ -0,0 +1,116 @@
+from typing import Any, Callable, NamedTuple, Optional, ParamSpec, TypeVar
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import wraps
+import threading
+import time
+
+P = ParamSpec('P')
+R = TypeVar('R')
+
+DEFAULT_SIZE = 256
+DEFAULT_TTL = 600.0
+
+
+class MemoStats(NamedTuple):
+    hits: int
+    misses: int
+    coalesced: int
+    size: int
+
+
+class Memo:
+    """
+    A bounded, expiring in-process memo around one API call. Concurrent
+    calls with the same arguments share the one request that's already in
+    flight rather than each making their own. Failures aren't cached.
+    """
+
+    def __init__(self,
+                 name: str,
+                 maxsize: int = DEFAULT_SIZE,
+                 ttl: float = DEFAULT_TTL):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Any, tuple[float, Any]] = OrderedDict()
+        self._in_flight: dict[Any, Future] = {}
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    def __call__(self, fn: Callable[P, R]) -> Callable[P, R]:
+        @wraps(fn)
+        def memoized(*args: P.args, **kwargs: P.kwargs) -> R:
+            return self.get((args, tuple(sorted(kwargs.items()))),
+                            lambda: fn(*args, **kwargs))
+
+        return memoized
+
+    def get(self, key: Any, load: Callable[[], R]) -> R:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+
+            future = self._in_flight.get(key)
+            leader = future is None
+            if future is None:
+                self._misses += 1
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = load()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        future.set_result(value)
+
+        return value
+
+    def stats(self) -> MemoStats:
+        with self._lock:
+            return MemoStats(
+                self._hits, self._misses, self._coalesced, len(self._entries))
+
+
+_memos: list[Memo] = []
+
+
+def memoize(name: str) -> Memo:
+    memo = Memo(name)
+    _memos.append(memo)
+    return memo
+
+
+def configure(maxsize: Optional[int] = None,
+              ttl: Optional[float] = None) -> None:
+    for memo in _memos:
+        with memo._lock:
+            if maxsize is not None:
+                memo.maxsize = maxsize
+            if ttl is not None:
+                memo.ttl = ttl
+
+
+def stats() -> dict[str, MemoStats]:
+    return dict((memo.name, memo.stats()) for memo in _memos)
@@ -1,5 +1,6 @@
-import httpx
-from typing import TypedDict, Unpack, NotRequired, cast, Any
+import gov.cache
+import gov.request
+from typing import TypedDict, Unpack, NotRequired
 from datetime import date
 
 
@@ -54,15 +55,12 @@ BASE_URL = 'https://commonsvotes-api.parliament.uk'
 
 
 def search(**params: Unpack[DivisionSearchParams]) -> list[Division]:
-    return httpx.get(
+    return gov.request.get(
         BASE_URL + '/data/divisions.json/search',
-        params=cast(Any, params),
-        timeout=30.0,
-    ).raise_for_status().json()
+        params=params,
+    )
 
 
+@gov.cache.memoize('divisions.commons.get')
 def get(id: int) -> Division:
-    return httpx.get(
-        BASE_URL + '/data/division/{}.json'.format(id),
-        timeout=30.0,
-    ).raise_for_status().json()
+    return gov.request.get(BASE_URL + '/data/division/{}.json'.format(id))
@@ -1,5 +1,5 @@
-import httpx
-from typing import TypedDict, Unpack, NotRequired, cast, Any, Optional
+import gov.request
+from typing import TypedDict, Unpack, NotRequired, Optional
 
 
 class Member(TypedDict):
@@ -61,8 +61,7 @@ BASE_URL = 'https://lordsvotes-api.parliament.uk/'
 
 
 def search(**params: Unpack[DivisionSearchParams]) -> list[Division]:
-    return httpx.get(
+    return gov.request.get(
         BASE_URL + '/data/Divisions/search',
-        params=cast(Any, params),
-        timeout=30.0,
-    ).raise_for_status().json()
+        params=params,
+    )
@@ -0,0 +1,105 @@
+from typing import NamedTuple, Optional
+from collections import deque
+import threading
+import time
+
+INITIAL_LIMIT = 4.0
+MIN_LIMIT = 1.0
+MAX_LIMIT = 32.0
+
+# Multiplicative decrease on any sign of trouble
+BACKOFF_RATIO = 0.5
+# A response this many times slower than the host's usual counts as a spike
+LATENCY_SPIKE = 3.0
+# How quickly the idea of the host's usual latency follows new responses.
+# Spikes still count, only more slowly, so a lasting rise in latency (or a
+# host serving both quick searches and slow gets) becomes the new usual
+BASELINE_WEIGHT = 0.1
+SPIKE_WEIGHT = 0.02
+
+
+class Decision(NamedTuple):
+    time: float
+    reason: str
+    limit: float
+
+
+class LimiterState(NamedTuple):
+    limit: float
+    in_flight: int
+    baseline: Optional[float]
+    decisions: list[Decision]
+
+
+class AdaptiveLimiter:
+    """
+    AIMD control of how many requests may be in flight to one host. Every
+    healthy response raises the limit by 1/limit, so about one more slot per
+    round trip's worth of responses. A 429, 5xx, failed request or latency
+    spike halves it, at most once per round trip so a burst of failures
+    from the same moment only counts once.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._limit = INITIAL_LIMIT
+        self._in_flight = 0
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+        self._decisions: deque[Decision] = deque(maxlen=50)
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def try_acquire(self) -> bool:
+        with self._cond:
+            if self._in_flight >= int(self._limit):
+                return False
+
+            self._in_flight += 1
+            return True
+
+    def release(self, latency: Optional[float], healthy: bool) -> None:
+        with self._cond:
+            self._in_flight -= 1
+
+            if healthy and latency is not None:
+                spike = self._baseline is not None \
+                    and latency > self._baseline * LATENCY_SPIKE
+                weight = SPIKE_WEIGHT if spike else BASELINE_WEIGHT
+                self._baseline = latency if self._baseline is None \
+                    else (1 - weight) * self._baseline + weight * latency
+
+                if spike:
+                    self._decrease('latency spike {:.2f}s'.format(latency))
+                else:
+                    previous = self._limit
+                    self._limit = min(MAX_LIMIT, previous + 1 / previous)
+                    # Only worth noting when it lets another request in
+                    if int(self._limit) > int(previous):
+                        self._decide('healthy')
+            elif not healthy:
+                self._decrease('throttled or failed')
+
+            self._cond.notify_all()
+
+    def state(self) -> LimiterState:
+        with self._cond:
+            return LimiterState(
+                self._limit, self._in_flight, self._baseline,
+                list(self._decisions))
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < (self._baseline or 0.0):
+            return
+
+        self._last_decrease = now
+        self._limit = max(MIN_LIMIT, self._limit * BACKOFF_RATIO)
+        self._decide(reason)
+
+    def _decide(self, reason: str) -> None:
+        self._decisions.append(Decision(time.time(), reason, self._limit))
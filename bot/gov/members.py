@@ -1,8 +1,13 @@
-import httpx
-from typing import NotRequired, TypedDict, Union, Literal, Unpack, cast, Any
+from concurrent.futures import ThreadPoolExecutor
+import gov.request
+from typing import NotRequired, TypedDict, Union, Literal, Unpack
 
 BASE_URL = 'https://members-api.parliament.uk'
 
+# The largest page the search endpoint will return
+SEARCH_PAGE_SIZE = 20
+FETCH_WORKERS = 16
+
 
 class Party(TypedDict):
     id: int
@@ -43,6 +48,30 @@ def total_members_lords() -> int:
     )['totalResults']
 
 
+def current_members(house: Union[Literal[1], Literal[2]]) -> list[Member]:
+    first = search(
+        House=house,
+        IsCurrentMember=True,
+        skip=0,
+        take=SEARCH_PAGE_SIZE,
+    )
+
+    # The rest of the pages can all be fetched at once now the total's known,
+    # leaving it to gov.request to pace them
+    skips = range(SEARCH_PAGE_SIZE, first['totalResults'], SEARCH_PAGE_SIZE)
+    with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+        pages = list(pool.map(lambda skip: search(
+            House=house,
+            IsCurrentMember=True,
+            skip=skip,
+            take=SEARCH_PAGE_SIZE,
+        ), skips))
+
+    return [item['value']
+            for page in (first, *pages)
+            for item in page['items']]
+
+
 class MemberSearchResultMember(TypedDict):
     value: Member
 
@@ -63,8 +92,7 @@ class MemberSearchParams(TypedDict):
 
 
 def search(**params: Unpack[MemberSearchParams]) -> MemberSearchResult:
-    return httpx.get(
+    return gov.request.get(
         BASE_URL + '/api/Members/Search',
-        params=cast(Any, params),
-        timeout=30.0,
-    ).raise_for_status().json()
+        params=params,
+    )
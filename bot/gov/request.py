@@ -0,0 +1,229 @@
+from typing import Any, Optional
+from collections import deque
+from concurrent.futures import (
+    Future,
+    ThreadPoolExecutor,
+    FIRST_COMPLETED,
+    wait,
+)
+from urllib.parse import urlsplit
+import random
+import threading
+import time
+import httpx
+
+from gov.limiter import AdaptiveLimiter, LimiterState
+
+# Tighter than the 30s the calls used to make with, now that a slow or
+# failed request gets retried (or hedged) instead of stalling the run
+TIMEOUT = httpx.Timeout(10.0, connect=3.0)
+
+RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+BREAKER_FAILURES = 5
+BREAKER_RESET = 30.0
+
+# Once a host has enough history, a request still going after this
+# percentile of its recent latencies gets a duplicate sent alongside it
+HEDGE_PERCENTILE = 0.95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops requests to a host after BREAKER_FAILURES consecutive failures,
+    then lets a single trial request through once BREAKER_RESET seconds
+    have passed. The trial succeeding closes the breaker again.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+
+            if time.monotonic() - self._opened_at < BREAKER_RESET:
+                return False
+
+            if self._trial_running:
+                return False
+
+            self._trial_running = True
+            return True
+
+    def success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self._failures >= BREAKER_FAILURES:
+                self._opened_at = time.monotonic()
+
+
+class Host:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self.limiter = AdaptiveLimiter()
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def record_latency(self, latency: float) -> None:
+        with self._lock:
+            self._latencies.append(latency)
+
+    def hedge_after(self) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < HEDGE_MIN_SAMPLES:
+                return None
+
+            latencies = sorted(self._latencies)
+
+        return latencies[int(HEDGE_PERCENTILE * (len(latencies) - 1))]
+
+
+class RetryableStatusError(Exception):
+    def __init__(self, response: httpx.Response) -> None:
+        super().__init__('{} from {}'.format(
+            response.status_code, response.url))
+        self.response = response
+
+
+_client = httpx.Client(http2=True, timeout=TIMEOUT)
+_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix='gov-hedge')
+_hosts: dict[str, Host] = {}
+_hosts_lock = threading.Lock()
+
+
+def host(url: str) -> Host:
+    name = urlsplit(url).netloc
+    with _hosts_lock:
+        return _hosts.setdefault(name, Host(name))
+
+
+def get(url: str, params: Any = None) -> Any:
+    # Only for idempotent GETs: requests may be retried, and hedging means
+    # the same request can be in flight twice at once
+    state = host(url)
+
+    error: Exception = CircuitOpenError(state.name)
+    for attempt in range(RETRIES + 1):
+        if attempt > 0:
+            time.sleep(_backoff(attempt, error))
+
+        if not state.breaker.allow():
+            raise CircuitOpenError(
+                'too many failures talking to ' + state.name)
+
+        try:
+            response = _hedged_get(state, url, params)
+        except (httpx.TransportError, RetryableStatusError) as e:
+            state.breaker.failure()
+            print('\tretrying', url, 'after', repr(e))
+            error = e
+            continue
+        except BaseException:
+            # Not worth retrying, but still has to count against the host,
+            # or a trial request failing this way would leave it half open
+            # and refusing everything for good
+            state.breaker.failure()
+            raise
+
+        state.breaker.success()
+        return response.raise_for_status().json()
+
+    raise error
+
+
+def _backoff(attempt: int, error: Exception) -> float:
+    if isinstance(error, RetryableStatusError):
+        retry_after = error.response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+
+    # Full jitter, so retries from parallel fetches don't line up
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _hedged_get(state: Host, url: str, params: Any) -> httpx.Response:
+    hedge_after = state.hedge_after()
+    if hedge_after is None:
+        return _timed_get(state, url, params)
+
+    pending: set[Future[httpx.Response]] = {
+        _pool.submit(_timed_get, state, url, params)
+    }
+    done, _ = wait(pending, timeout=hedge_after)
+    hedge: Optional[Future[httpx.Response]] = None
+    # Only hedge into a free slot: with none free the limiter is saying the
+    # host is busy enough, and a duplicate would just queue behind the
+    # request it's meant to be overtaking
+    if not done and state.limiter.try_acquire():
+        hedge = _pool.submit(_timed_get, state, url, params, True)
+        pending.add(hedge)
+
+    error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                error = future.exception()
+                if error is None:
+                    return future.result()
+    finally:
+        # A hedge still waiting for a pool thread isn't worth sending once
+        # the other request's finished, but its slot needs giving back
+        if hedge and hedge.cancel():
+            state.limiter.release(None, True)
+
+    assert error
+    raise error
+
+
+def _timed_get(state: Host,
+               url: str,
+               params: Any,
+               acquired: bool = False) -> httpx.Response:
+    latency: Optional[float] = None
+    healthy = False
+
+    if not acquired:
+        state.limiter.acquire()
+    try:
+        start = time.monotonic()
+        response = _client.get(url, params=params)
+        latency = time.monotonic() - start
+        healthy = response.status_code not in RETRY_STATUSES
+    finally:
+        state.limiter.release(latency, healthy)
+
+    if not healthy:
+        raise RetryableStatusError(response)
+
+    state.record_latency(latency)
+    return response
+
+
+def limits() -> dict[str, LimiterState]:
+    with _hosts_lock:
+        hosts = list(_hosts.values())
+
+    return dict((state.name, state.limiter.state()) for state in hosts)
@@ -0,0 +1,155 @@
+from typing import Iterator, NamedTuple, Optional
+from contextlib import contextmanager
+import os
+import socket
+import sqlite3
+import time
+import uuid
+
+
+class Lease(NamedTuple):
+    name: str
+    holder: str
+    # Goes up every time the lease changes hands, so anything written under
+    # an older token can be told apart from (and lose to) the current holder
+    token: int
+    expires: float
+
+
+class LeaseLostError(Exception):
+    pass
+
+
+def holder_id() -> str:
+    return '{}:{}:{}'.format(
+        socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+
+
+class LeaseStore:
+    """
+    Time limited, exclusive leases with fencing tokens. Only the local
+    SQLite store exists for now, but anything shared between hosts that can
+    do the same atomic compare-and-set could stand in for it.
+    """
+
+    def acquire(self, name: str, holder: str, ttl: float) -> Optional[Lease]:
+        raise NotImplementedError()
+
+    def renew(self, lease: Lease, ttl: float) -> Lease:
+        raise NotImplementedError()
+
+    def release(self, lease: Lease) -> None:
+        raise NotImplementedError()
+
+    def advance(self, lease: Lease, token: int) -> Lease:
+        raise NotImplementedError()
+
+    def acquire_wait(self,
+                     name: str,
+                     holder: str,
+                     ttl: float,
+                     timeout: float) -> Lease:
+        deadline = time.monotonic() + timeout
+        while True:
+            lease = self.acquire(name, holder, ttl)
+            if lease:
+                return lease
+
+            if time.monotonic() > deadline:
+                raise TimeoutError('timed out waiting for lease ' + name)
+
+            time.sleep(0.1)
+
+
+class SqliteLeaseStore(LeaseStore):
+    def __init__(self, path: str) -> None:
+        self._path = path
+        with self._transaction() as db:
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    token INTEGER NOT NULL,
+                    expires REAL NOT NULL
+                )
+            ''')
+
+    def acquire(self, name: str, holder: str, ttl: float) -> Optional[Lease]:
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                'SELECT holder, token, expires FROM leases WHERE name = ?',
+                (name,),
+            ).fetchone()
+
+            token = 1
+            if row:
+                current_holder, current_token, expires = row
+                if current_holder != holder and expires > now:
+                    return None
+
+                token = current_token + 1
+
+            lease = Lease(name, holder, token, now + ttl)
+            db.execute(
+                'INSERT OR REPLACE INTO leases VALUES (?, ?, ?, ?)', lease)
+
+        return lease
+
+    def renew(self, lease: Lease, ttl: float) -> Lease:
+        # Anyone else taking the lease moves the token on, so even a lapsed
+        # lease can be picked back up as long as the token still matches
+        renewed = lease._replace(expires=time.time() + ttl)
+        with self._transaction() as db:
+            updated = db.execute(
+                '''UPDATE leases SET expires = ?
+                   WHERE name = ? AND holder = ? AND token = ?''',
+                (renewed.expires, lease.name, lease.holder, lease.token),
+            ).rowcount
+
+        if updated == 0:
+            raise LeaseLostError('lost lease ' + lease.name)
+
+        return renewed
+
+    def advance(self, lease: Lease, token: int) -> Lease:
+        # For when a fencing token's already been seen elsewhere, say after
+        # the lease database was wiped or moved and its tokens restarted
+        advanced = lease._replace(token=token)
+        with self._transaction() as db:
+            updated = db.execute(
+                '''UPDATE leases SET token = ?
+                   WHERE name = ? AND holder = ? AND token = ? AND token < ?''',
+                (token, lease.name, lease.holder, lease.token, token),
+            ).rowcount
+
+        if updated == 0:
+            raise LeaseLostError('lost lease ' + lease.name)
+
+        return advanced
+
+    def release(self, lease: Lease) -> None:
+        # The row stays so the next holder's token carries on from this one
+        with self._transaction() as db:
+            db.execute(
+                '''UPDATE leases SET expires = 0
+                   WHERE name = ? AND holder = ? AND token = ?''',
+                (lease.name, lease.holder, lease.token),
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        # A connection per operation keeps it safe to use from any thread,
+        # and taking the write lock up front makes each read-then-write
+        # atomic across processes
+        db = sqlite3.connect(self._path, timeout=30.0, isolation_level=None)
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            try:
+                yield db
+            except BaseException:
+                db.execute('ROLLBACK')
+                raise
+            db.execute('COMMIT')
+        finally:
+            db.close()
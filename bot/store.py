@@ -0,0 +1,238 @@
+from typing import NamedTuple, Optional
+from collections.abc import Iterable
+from array import array
+from bisect import bisect_right
+import json
+import mmap
+import os
+
+from vote import Div
+
+# Cell values, stored as signed bytes so a column can be read straight off
+# the memory map
+AYE = 1
+NO = -1
+ABSENT = 0
+
+
+class StoredDiv(NamedTuple):
+    id: int
+    date: str
+    title: str
+    offset: int
+    rows: int
+
+
+class StoredMember(NamedTuple):
+    id: int
+    name: str
+    party: str
+    abbr: str
+    # [offset, party] for each party the member has sat for, from the first
+    # column written under it. Empty until they first change party.
+    parties: list = []
+
+    def party_at(self, offset: int) -> str:
+        if not self.parties:
+            return self.party
+
+        starts = [start for start, _ in self.parties]
+        return self.parties[max(0, bisect_right(starts, offset) - 1)][1]
+
+
+class VoteStore:
+    """
+    A members x divisions vote matrix for a single house, kept on disk as one
+    int8 column per division.
+
+    Layout of the store directory:
+      members.json  - row order, one [id, name, party, abbr, parties] entry
+                      per row, parties giving any changes of party over time
+      columns.bin   - every division's column, appended back to back
+      index.jsonl   - one line per division giving its column's offset
+
+    Members only ever get appended as new rows, so older columns are simply
+    shorter than newer ones and any row past a column's end is absent.
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        self._members_path = os.path.join(path, 'members.json')
+        self._columns_path = os.path.join(path, 'columns.bin')
+        self._index_path = os.path.join(path, 'index.jsonl')
+
+        self.members: list[StoredMember] = []
+        self._rows: dict[int, int] = {}
+        if os.path.exists(self._members_path):
+            with open(self._members_path) as f:
+                self.members = [StoredMember(*row) for row in json.load(f)]
+            self._rows = dict(
+                (member.id, row) for row, member in enumerate(self.members)
+            )
+
+        self.divisions: dict[int, StoredDiv] = {}
+        self._size = 0
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                for line in f:
+                    div = StoredDiv(**json.loads(line))
+                    self.divisions[div.id] = div
+                    self._size = max(self._size, div.offset + div.rows)
+
+        # The index is only written once a column is fully on disk, so
+        # anything past the last indexed column is a torn write
+        with open(self._columns_path, 'ab') as f:
+            f.truncate(self._size)
+
+        self._map: Optional[mmap.mmap] = None
+
+    def add(self, div: Div) -> None:
+        if div.id in self.divisions:
+            return
+
+        members_changed = False
+        for member in (*div.yes, *div.no):
+            row = self._rows.get(member.id)
+            stored = StoredMember(
+                member.id, member.name, member.party, member.abbr)
+
+            if row is None:
+                self._rows[member.id] = len(self.members)
+                self.members.append(stored)
+                members_changed = True
+                continue
+
+            current = self.members[row]
+            if current[:4] == stored[:4]:
+                continue
+
+            parties = current.parties
+            if current.party != member.party:
+                # Earlier columns still count towards the old party
+                parties = (parties or [[0, current.party]]) \
+                    + [[self._size, member.party]]
+
+            self.members[row] = stored._replace(parties=parties)
+            members_changed = True
+
+        column = array('b', bytes(len(self.members)))
+        for member in div.yes:
+            column[self._rows[member.id]] = AYE
+        for member in div.no:
+            column[self._rows[member.id]] = NO
+
+        if members_changed:
+            tmp_path = self._members_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump([list(member) for member in self.members], f)
+            os.replace(tmp_path, self._members_path)
+
+        with open(self._columns_path, 'ab') as f:
+            f.write(column.tobytes())
+
+        stored_div = StoredDiv(
+            id=div.id,
+            date=div.date.isoformat(),
+            title=div.title,
+            offset=self._size,
+            rows=len(column),
+        )
+        with open(self._index_path, 'a') as f:
+            f.write(json.dumps(stored_div._asdict()) + '\n')
+
+        self.divisions[div.id] = stored_div
+        self._size += len(column)
+        self._unmap()
+
+    def find_divisions(self, term: str) -> list[int]:
+        term = term.lower()
+        return sorted(div.id for div in self.divisions.values()
+                      if term in div.title.lower())
+
+    def column(self, div_id: int) -> array:
+        div = self.divisions[div_id]
+        return array('b', self._view()[div.offset:div.offset + div.rows])
+
+    def vote(self, member_id: int, div_id: int) -> int:
+        row = self._rows.get(member_id)
+        div = self.divisions[div_id]
+        if row is None or row >= div.rows:
+            return ABSENT
+
+        return self._view()[div.offset + row]
+
+    def member_votes(
+        self,
+        member_id: int,
+        div_ids: Optional[Iterable[int]] = None,
+    ) -> dict[int, int]:
+        if div_ids is None:
+            div_ids = sorted(self.divisions)
+
+        return dict((div_id, self.vote(member_id, div_id))
+                    for div_id in div_ids)
+
+    def party_cohesion(
+        self,
+        party: str,
+        div_ids: Optional[Iterable[int]] = None,
+    ) -> Optional[float]:
+        # Mean Rice index, |ayes - noes| / (ayes + noes), over the divisions
+        # in which the party had anyone voting
+        members = [(row, member) for row, member in enumerate(self.members)
+                   if member.party == party or any(
+                       name == party for _, name in member.parties)]
+        if div_ids is None:
+            div_ids = self.divisions
+
+        view = self._view()
+        total = 0.0
+        counted = 0
+        for div_id in div_ids:
+            div = self.divisions[div_id]
+            ayes = 0
+            noes = 0
+            for row, member in members:
+                if row >= div.rows:
+                    break
+
+                if member.party_at(div.offset) != party:
+                    continue
+
+                cell = view[div.offset + row]
+                if cell == AYE:
+                    ayes += 1
+                elif cell == NO:
+                    noes += 1
+
+            if ayes + noes > 0:
+                total += abs(ayes - noes) / (ayes + noes)
+                counted += 1
+
+        if counted == 0:
+            return None
+
+        return total / counted
+
+    def close(self) -> None:
+        self._unmap()
+
+    def _view(self) -> memoryview:
+        if self._size == 0:
+            return memoryview(b'').cast('b')
+
+        if self._map is None:
+            with open(self._columns_path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return memoryview(self._map).cast('b')
+
+    def _unmap(self) -> None:
+        # The next read maps the file afresh. A map that's still being read
+        # through a view handed out earlier gets closed once that's dropped.
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass
+            self._map = None
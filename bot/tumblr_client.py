@@ -0,0 +1,198 @@
+from typing import Any, Optional
+from urllib.parse import quote
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+import httpx
+
+from tumblr_neue import NpfContent
+
+API_HOST = 'https://api.tumblr.com'
+
+
+class TumblrError(Exception):
+    def __init__(self, status: int, msg: str, errors: list) -> None:
+        super().__init__('Tumblr API error {}: {}'.format(status, msg))
+        self.status = status
+        self.msg = msg
+        self.errors = errors
+
+
+def _encode(value: str) -> str:
+    return quote(value, safe='~')
+
+
+class TumblrClient:
+    """
+    Async client for the handful of NPF endpoints the bot uses, signing each
+    request with OAuth1 (HMAC-SHA1) and keeping connections to the API alive
+    between calls.
+
+    Failed calls raise TumblrError carrying the response's meta status and
+    message, rather than handing back the error body like pytumblr2 does.
+    """
+
+    def __init__(self,
+                 consumer_key: str,
+                 consumer_secret: str,
+                 oauth_token: str,
+                 oauth_secret: str,
+                 max_connections: int = 10):
+        self._consumer_key = consumer_key
+        self._signing_key = '{}&{}'.format(
+            _encode(consumer_secret), _encode(oauth_secret))
+        self._oauth_token = oauth_token
+
+        self._http = httpx.AsyncClient(
+            base_url=API_HOST,
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+        )
+
+    async def __aenter__(self) -> 'TumblrClient':
+        return self
+
+    async def __aexit__(self, *_: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        await self._http.aclose()
+
+    async def get_single_post(self, blog: str, id: int) -> dict:
+        response = await self._request('GET', f'/v2/blog/{blog}/posts', {
+            'id': str(id),
+            'npf': 'true',
+            'api_key': self._consumer_key,
+        })
+        return response['posts'][0]
+
+    async def create_post(
+        self,
+        blog: str,
+        content: list[NpfContent],
+        tags: Optional[list[str]] = None,
+        layout: Optional[list[dict]] = None,
+        state: Optional[str] = None,
+    ) -> dict:
+        return await self._request(
+            'POST', f'/v2/blog/{blog}/posts',
+            body=self._post_body(content, tags, layout, state),
+        )
+
+    async def edit_post(
+        self,
+        blog: str,
+        id: int,
+        content: list[NpfContent],
+        tags: Optional[list[str]] = None,
+        layout: Optional[list[dict]] = None,
+        state: Optional[str] = None,
+    ) -> dict:
+        return await self._request(
+            'PUT', f'/v2/blog/{blog}/posts/{id}',
+            body=self._post_body(content, tags, layout, state),
+        )
+
+    def _post_body(
+        self,
+        content: list[NpfContent],
+        tags: Optional[list[str]],
+        layout: Optional[list[dict]],
+        state: Optional[str],
+    ) -> dict:
+        body: dict[str, Any] = {'content': content}
+        if tags is not None:
+            body['tags'] = ','.join(tags)
+        if layout is not None:
+            body['layout'] = layout
+        if state is not None:
+            body['state'] = state
+
+        return body
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[dict[str, str]] = None,
+        body: Optional[dict] = None,
+    ) -> dict:
+        params = params or {}
+        headers = {}
+        content = None
+        if body is not None:
+            content = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+
+        headers['Authorization'] = self._authorization(
+            method, path, params, content)
+
+        response = await self._http.request(
+            method, path,
+            params=params,
+            content=content,
+            headers=headers,
+        )
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = {'meta': {
+                'status': response.status_code,
+                'msg': response.reason_phrase,
+            }}
+
+        meta = data.get('meta', {})
+        status = meta.get('status', response.status_code)
+        if status < 200 or status >= 300:
+            raise TumblrError(
+                status, meta.get('msg', ''), data.get('errors', []))
+
+        return data['response']
+
+    def _authorization(
+        self,
+        method: str,
+        path: str,
+        params: dict[str, str],
+        content: Optional[bytes],
+    ) -> str:
+        oauth = {
+            'oauth_consumer_key': self._consumer_key,
+            'oauth_nonce': secrets.token_hex(16),
+            'oauth_signature_method': 'HMAC-SHA1',
+            'oauth_timestamp': str(int(time.time())),
+            'oauth_token': self._oauth_token,
+            'oauth_version': '1.0',
+        }
+
+        # JSON bodies aren't signed directly, they go in as a body hash
+        if content is not None:
+            oauth['oauth_body_hash'] = base64.b64encode(
+                hashlib.sha1(content).digest()).decode()
+
+        pairs = sorted(
+            (_encode(key), _encode(value))
+            for key, value in (*params.items(), *oauth.items())
+        )
+        base = '&'.join([
+            method.upper(),
+            _encode(API_HOST + path),
+            _encode('&'.join(f'{key}={value}' for key, value in pairs)),
+        ])
+        digest = hmac.new(
+            self._signing_key.encode(), base.encode(), hashlib.sha1
+        ).digest()
+        oauth['oauth_signature'] = base64.b64encode(digest).decode()
+
+        return 'OAuth ' + ', '.join(
+            f'{_encode(key)}="{_encode(value)}"'
+            for key, value in oauth.items()
+        )
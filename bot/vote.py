@@ -1,16 +1,51 @@
-from pytumblr2 import TumblrRestClient
-from typing import Optional, NamedTuple, Union, Literal
-from collections.abc import Iterable
-from datetime import datetime
-
-from tumblr_neue import NpfContent
+from typing import Optional, NamedTuple, Union, Literal, TYPE_CHECKING, cast
+from collections.abc import Iterable, Callable, Awaitable
+from datetime import datetime, date
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import json
+import multiprocessing
+import os
+import threading
+
+from blog import Blog
+from lease import Lease, LeaseStore
+from tumblr_neue import NpfContent, NpfTextContent, NpfTextFormatting
 import gov.bills
 import gov.members
 
+if TYPE_CHECKING:
+    from store import VoteStore
+
 TUMBLR_TEXT_BLOCK_LEN = 4096
+TUMBLR_POST_BLOCK_LIMIT = 100
+# Conservative cap on the JSON size of a single post's content
+TUMBLR_POST_PAYLOAD_LIMIT = 256 * 1024
+NL_LEN = len('\n')
+
+FETCH_WORKERS = 16
+
+# Divisions are prepared and rendered this many at a time, so posting can
+# start before a long backfill has been fully rendered
+RENDER_BATCH_SIZE = 64
+# Rendering a full Lords division takes around a millisecond, so it takes a
+# few dozen of them to be worth the cost of pickling them across processes
+PARALLEL_RENDER_MIN_MEMBERS = 20000
+
+DIGEST_TAGS = ['digest']
+
+# Groups that don't take a whip, so there's no party line to rebel against
+UNWHIPPED_PARTIES = {
+    'Independent',
+    'Crossbench',
+    'Non-affiliated',
+    'Bishops',
+    'Speaker',
+}
 
 
 class Member(NamedTuple):
+    id: int
     name: str
     sortName: str
     party: str
@@ -21,7 +56,7 @@ class Div(NamedTuple):
     id: int
     title_prefix: str
     title: str
-    desc: Optional[str]
+    desc: Optional[NpfTextContent]
     yes: list[Member]
     yes_count: int
     no: list[Member]
@@ -29,6 +64,36 @@ class Div(NamedTuple):
     date: datetime
 
 
+class LazyDiv(NamedTuple):
+    id: int
+    date: datetime
+    load: Callable[[], Div]
+
+
+class BillSummary(NamedTuple):
+    id: int
+    shortTitle: str
+    longTitle: str
+    originatingHouse: str
+    currentHouse: str
+    stage: str
+
+
+class RenderJob(NamedTuple):
+    div: Div
+    house: str
+    vote_url: str
+    members_total: int
+    bill: Optional[BillSummary]
+    roster: Optional[dict[int, str]]
+
+
+class RenderedPost(NamedTuple):
+    id: int
+    parts: list[list[NpfContent]]
+    read_more_index: int
+
+
 class VoteTally(NamedTuple):
     total: int
     txt: str
@@ -39,6 +104,13 @@ class MemberVoteTally(NamedTuple):
     members: list[Member]
 
 
+class PartyRebels(NamedTuple):
+    party: str
+    majority: Union[Literal['Aye'], Literal['No']]
+    majority_count: int
+    members: list[Member]
+
+
 def find_bill_for(title: str) -> Optional[gov.bills.Bill]:
     bill_index = title.find(' Bill')
     if bill_index < 0:
@@ -58,72 +130,271 @@ def find_bill_for(title: str) -> Optional[gov.bills.Bill]:
     return items[0]
 
 
+def render_post(job: RenderJob) -> RenderedPost:
+    post = Post(job.div)
+
+    post.header(job.house, job.vote_url)
+    post.tallies(job.members_total)
+
+    if job.house == 'Commons':
+        post.commons_business()
+
+    if job.bill:
+        post.bill(job.bill)
+
+    rebels_index = None
+    if job.roster is not None:
+        rebels_index = post.rebels(job.roster)
+
+    read_more_index = post.indv_votes()
+    if rebels_index is not None:
+        read_more_index = rebels_index
+
+    return RenderedPost(job.div.id, post.parts(), read_more_index)
+
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+
+
+def render_posts(jobs: list[RenderJob]) -> list[RenderedPost]:
+    # Shipping divisions to other processes only pays off once there are
+    # enough members across them, otherwise render here
+    members = sum(len(job.div.yes) + len(job.div.no) for job in jobs)
+    workers = _usable_cpus()
+    if len(jobs) < 2 or members < PARALLEL_RENDER_MIN_MEMBERS or workers < 2:
+        return [render_post(job) for job in jobs]
+
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            # Forking would copy the state of every other thread running
+            # by now (to_thread workers, hedged requests, httpx) into the
+            # children, locks and all
+            context = multiprocessing.get_context(
+                'forkserver'
+                if 'forkserver' in multiprocessing.get_all_start_methods()
+                else 'spawn')
+            _render_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=context)
+
+    # A few chunks per worker keeps them evenly loaded without paying the
+    # round trip for every division
+    chunksize = max(1, len(jobs) // (workers * 4))
+    return list(_render_pool.map(render_post, jobs, chunksize=chunksize))
+
+
+def _usable_cpus() -> int:
+    # Not every platform can say which CPUs this process may run on
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+
+    return os.cpu_count() or 1
+
+
+def shutdown_render_pool() -> None:
+    global _render_pool
+    if _render_pool is not None:
+        _render_pool.shutdown()
+        _render_pool = None
+
+
+async def _gather_all(*aws: Awaitable) -> None:
+    # Let every blog get as far as it can before reporting a failure
+    for result in await asyncio.gather(*aws, return_exceptions=True):
+        if isinstance(result, BaseException):
+            raise result
+
+
 class VotePoster:
-    blog: str
-    client: TumblrRestClient
-    last_id: int
+    blogs: list[Blog]
     members_total: int
     house: Union[Literal['Commons'], Literal['Lords']]
+    store: Optional['VoteStore'] = None
+    show_rebels = False
+    _roster: Optional[dict[int, str]] = None
+    leases: Optional[LeaseStore] = None
+    lease: Optional[Lease] = None
+    lease_ttl = 300.0
+
+    async def check_lease(self) -> None:
+        # Renewing fails if another instance has taken the house over, in
+        # which case this one has to stop before it double posts
+        if self.leases and self.lease:
+            self.lease = await asyncio.to_thread(
+                self.leases.renew, self.lease, self.lease_ttl)
+
+    def current_members(self) -> list[gov.members.Member]:
+        raise NotImplementedError()
+
+    def roster(self) -> dict[int, str]:
+        if self._roster is None:
+            print('loading member roster')
+            self._roster = dict(
+                (member['id'], member['latestParty']['name'])
+                for member in self.current_members()
+            )
+
+        return self._roster
 
-    def division_page(self, size: int, offset: int) -> list[Div]:
+    def division_page(self, size: int, offset: int) -> list[LazyDiv]:
         raise NotImplementedError()
 
     def vote_url(self, id: int) -> str:
         raise NotImplementedError()
 
-    def post(self) -> None:
+    def prepare(self, div: Div) -> RenderJob:
+        # Everything that needs the network or local state happens here, so
+        # the rendering itself can be done in another process
+        if self.store:
+            self.store.add(div)
+
+        print('preparing content for division', div.id)
+
+        bill = None
+        short_bill = find_bill_for(div.title)
+        if short_bill:
+            print('\tfound bill', short_bill['shortTitle'])
+            full_bill = gov.bills.get(short_bill['billId'])
+            # Only what the post shows, rather than the whole payload with
+            # its sponsors and agents, since it goes to a render process
+            bill = BillSummary(
+                id=full_bill['billId'],
+                shortTitle=full_bill['shortTitle'],
+                longTitle=full_bill['longTitle'],
+                originatingHouse=full_bill['originatingHouse'],
+                currentHouse=full_bill['currentHouse'],
+                stage=full_bill['currentStage']['description'],
+            )
+
+        roster = None
+        if self.show_rebels:
+            # Only the part of the roster the division needs
+            full_roster = self.roster()
+            roster = dict((member.id, full_roster[member.id])
+                          for member in (*div.yes, *div.no)
+                          if member.id in full_roster)
+
+        return RenderJob(
+            div=div,
+            house=self.house,
+            vote_url=self.vote_url(div.id),
+            members_total=self.members_total,
+            bill=bill,
+            roster=roster,
+        )
+
+    async def post(self) -> None:
+        print('collecting unpublished divisions')
+        divs = await asyncio.to_thread(self.load_unposted_divs)
+
+        # Each division is rendered once, in order, and every blog works
+        # through the renders at its own pace
+        renders = [asyncio.get_running_loop().create_future() for _ in divs]
+
+        async def render_all() -> None:
+            try:
+                for start in range(0, len(divs), RENDER_BATCH_SIZE):
+                    batch = divs[start:start + RENDER_BATCH_SIZE]
+                    jobs = await asyncio.to_thread(
+                        lambda: [self.prepare(div) for div in batch])
+                    rendered = await asyncio.to_thread(render_posts, jobs)
+
+                    for render, result in zip(
+                            renders[start:start + len(batch)], rendered):
+                        render.set_result(result)
+            except Exception as e:
+                for pending in renders:
+                    if not pending.done():
+                        pending.set_exception(e)
+
+        async def post_to(blog: Blog) -> None:
+            posts = 0
+            for render in renders:
+                rendered = await render
+                if rendered.id <= blog.last_id(self.house):
+                    continue
+
+                parts = rendered.parts
+                if not blog.try_reserve(len(parts)):
+                    print(f'\t{blog.name}: out of posts for this run')
+                    break
+
+                for i, part in enumerate(parts):
+                    print('\t{}: creating post {} of {} for division {}'.format(
+                        blog.name, i + 1, len(parts), rendered.id))
+                    await self.check_lease()
+                    await blog.create_post(
+                        part,
+                        read_more_index=(
+                            rendered.read_more_index if i == 0 else None),
+                    )
+
+                posts += 1
+                await blog.set_last_id(self.house, rendered.id)
+
+            print(f'{blog.name}: created', posts, 'posts')
+
+        await _gather_all(
+            render_all(), *(post_to(blog) for blog in self.blogs))
+
+    async def post_digest(self, include_today: bool = False) -> None:
         print('collecting unpublished divisions')
-        divs = self.load_unposted_divs()
+        divs = await asyncio.to_thread(self.load_unposted_divs)
 
+        days: dict[date, list[Div]] = {}
         for div in divs:
-            print('preparing content for division', div.id)
-            post = Post(div)
-
-            post.header(self.house, self.vote_url(div.id))
-            post.tallies(self.members_total)
-
-            if self.house == 'Commons':
-                post.commons_business()
-
-            short_bill = find_bill_for(div.title)
-            if short_bill:
-                print('\tfound bill', short_bill['shortTitle'])
-                bill = gov.bills.get(short_bill['billId'])
-                post.bill(bill)
-
-            read_more_index = post.indv_votes()
-
-            print('\tcreating post for division')
-            result = self.client.create_post(
-                self.blog,
-                content=post.content,
-                tags=[
-                    'uk gov', 'uk politics', 'uk parliament',
-                    'politics', 'vote', 'wankerwatch',
-                    # 'backdating'
-                ],
-                layout=[{
-                    'type': 'rows',
-                    'display': [{'blocks': [i]}
-                        for i in range(len(post.content))],
-                    'truncate_after': read_more_index,
-                }],
-                # state='queued',
-            )
+            days.setdefault(div.date.date(), []).append(div)
+
+        digests: list[DigestPost] = []
+        for day, day_divs in days.items():
+            # More divisions could still turn up today, so by default only
+            # digest days that are over
+            if day >= date.today() and not include_today:
+                print('\tleaving', len(day_divs), 'divisions from', day,
+                      'for a later digest')
+                break
+
+            print('preparing digest of', len(day_divs), 'divisions for', day)
+            digest = DigestPost(self.house, day)
+            for div in day_divs:
+                if self.store:
+                    self.store.add(div)
+
+                digest.division(div, self.vote_url(div.id))
+
+            digests.append(digest)
+
+        async def post_to(blog: Blog) -> None:
+            posts = 0
+            for digest in digests:
+                # A blog that's further along than the others might already
+                # have had some of these divisions posted individually
+                last_id = blog.last_id(self.house)
+                if digest.divs[-1].id <= last_id:
+                    continue
+
+                digest = digest.after(last_id)
+                parts = digest.parts()
+                if not blog.try_reserve(len(parts)):
+                    print(f'\t{blog.name}: out of posts for this run')
+                    break
+
+                for part, part_divs in zip(parts, digest.part_divs()):
+                    print(f'\t{blog.name}: creating digest post', posts + 1)
+                    await self.check_lease()
+                    await blog.create_post(part, DIGEST_TAGS)
+                    posts += 1
 
-            status = result['meta']['status'] if 'meta' in result else 200
-            if status < 200 or status >= 300:
-                raise ConnectionError(
-                    'Post creation failed: ' + result['meta']['msg']
-                )
+                    await blog.set_last_id(self.house, part_divs[-1].id)
 
-            print('\tdone!')
-            self.last_id = div.id
+            print(f'{blog.name}: created', posts, 'posts')
 
-        print('created', len(divs), 'posts')
+        await _gather_all(*(post_to(blog) for blog in self.blogs))
 
     def load_unposted_divs(self) -> list[Div]:
-        divs: list[Div] = []
+        divs: list[LazyDiv] = []
+        last_id = min(blog.last_id(self.house) for blog in self.blogs)
 
         size = 20
         offset = 0
@@ -131,7 +402,7 @@ class VotePoster:
         while searching:
             div_page = self.division_page(size, offset)
             for div in div_page:
-                if div.id <= self.last_id:
+                if div.id <= last_id:
                     searching = False
                     break
 
@@ -145,7 +416,11 @@ class VotePoster:
         # Want to go in time order
         divs.reverse()
 
-        return divs
+        # Only decode the full division (and fetch it, where the house's API
+        # needs a second request) once we know it's going to be posted. The
+        # fetches go out together, paced per host by gov.request.
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS) as pool:
+            return list(pool.map(lambda div: div.load(), divs))
 
     def vote_count_str(self, tally: Iterable[VoteTally]) -> str:
         percents = map(lambda item: item.txt, tally)
@@ -153,12 +428,18 @@ class VotePoster:
         return ', '.join(percents)
 
 
+def _payload_size(content: list[NpfContent]) -> int:
+    return len(json.dumps(content).encode())
+
+
 class Post:
     def __init__(self, div: Div) -> None:
         self.div = div
         self.content: list[NpfContent] = []
 
     def header(self, house: str, vote_url: str) -> None:
+        self.house = house
+
         self.content.append({
             'type': 'text',
             'text': '{} Vote'.format(house),
@@ -185,11 +466,8 @@ class Post:
             ]
         })
 
-        if self.div.desc:
-            self.content.append({
-                'type': 'text',
-                'text': self.div.desc
-            })
+        if self.div.desc and self.div.desc['text']:
+            self.content.append(self.div.desc)
 
     def tallies(self, members_total: int) -> None:
         vote_count_text = 'Ayes: {} '.format(self.div.yes_count)
@@ -268,9 +546,9 @@ class Post:
             ]
         })
 
-    def bill(self, bill: gov.bills.FullBill) -> None:
+    def bill(self, bill: BillSummary) -> None:
         BILL_PREFIX = 'Likely Referenced Bill: '
-        bill_name = BILL_PREFIX + bill['shortTitle']
+        bill_name = BILL_PREFIX + bill.shortTitle
 
         self.content.append({
             'type': 'text',
@@ -286,21 +564,20 @@ class Post:
                     'end': len(bill_name),
                     'type': 'link',
                     'url':
-                    'https://bills.parliament.uk/bills/' + str(bill['billId'])
+                    'https://bills.parliament.uk/bills/' + str(bill.id)
                 },
             ]
         })
 
         self.content.append({
             'type': 'text',
-            'text': 'Description: {}'.format(bill['longTitle']),
+            'text': 'Description: {}'.format(bill.longTitle),
         })
 
         bill_info = [
-            'Originating house: {}'.format(bill['originatingHouse']),
-            'Current house: {}'.format(bill['currentHouse']),
-            'Bill Stage: {}'.format(
-                bill['currentStage']['description']),
+            'Originating house: {}'.format(bill.originatingHouse),
+            'Current house: {}'.format(bill.currentHouse),
+            'Bill Stage: {}'.format(bill.stage),
         ]
 
         self.content.append({
@@ -308,6 +585,54 @@ class Post:
             'text': '\n'.join(bill_info),
         })
 
+    def rebels(self, roster: dict[int, str]) -> Optional[int]:
+        # Goes below the read more like the individual votes, since a big
+        # rebellion can run to hundreds of names
+        rebels = self._find_rebels(roster)
+        if len(rebels) == 0:
+            return None
+
+        self.content.append({
+            'type': 'text',
+            'text': 'Rebels',
+            'subtype': 'heading2',
+        })
+
+        read_more_index = len(self.content) - 1
+
+        SEP = ', '
+        for item in rebels:
+            text = '{} (party voted {}, {} to {}): '.format(
+                item.party, item.majority,
+                item.majority_count, len(item.members),
+            )
+            start = len(text)
+
+            for i, member in enumerate(item.members):
+                name = member.name if i == 0 else SEP + member.name
+                if len(text) + len(name) > TUMBLR_TEXT_BLOCK_LEN:
+                    self._append_small(text, start)
+                    text = ''
+                    start = 0
+                    name = member.name
+
+                text += name
+
+            self._append_small(text, start)
+
+        return read_more_index
+
+    def _append_small(self, text: str, start: int) -> None:
+        self.content.append({
+            'type': 'text',
+            'text': text,
+            'formatting': [{
+                'start': start,
+                'end': len(text),
+                'type': 'small',
+            }]
+        })
+
     def indv_votes(self) -> int:
         self.content.append({
             'type': 'text',
@@ -359,6 +684,44 @@ class Post:
         tally.sort(key=lambda item: item[0], reverse=True)
         return tally
 
+    def _find_rebels(self, roster: dict[int, str]) -> list[PartyRebels]:
+        # One pass over both lobbies to count each party's split, keyed on
+        # the party the member sits for rather than what the division says
+        counts: dict[str, list[int]] = {}
+        voters: list[tuple[Member, str, int]] = []
+        for side, members in ((0, self.div.yes), (1, self.div.no)):
+            for member in members:
+                party = roster.get(member.id, member.party)
+                if party in UNWHIPPED_PARTIES:
+                    continue
+
+                counts.setdefault(party, [0, 0])[side] += 1
+                voters.append((member, party, side))
+
+        rebels: dict[str, list[Member]] = {}
+        for member, party, side in voters:
+            ayes, noes = counts[party]
+            if ayes == noes:
+                continue
+
+            majority_side = 0 if ayes > noes else 1
+            if side != majority_side:
+                rebels.setdefault(party, []).append(member)
+
+        rebels_list: list[PartyRebels] = []
+        for party, members in rebels.items():
+            ayes, noes = counts[party]
+            members.sort(key=lambda member: member.sortName)
+            rebels_list.append(PartyRebels(
+                party=party,
+                majority='Aye' if ayes > noes else 'No',
+                majority_count=max(ayes, noes),
+                members=members,
+            ))
+
+        rebels_list.sort(key=lambda item: len(item.members), reverse=True)
+        return rebels_list
+
     def _vote_count_str(self, tally: Iterable[VoteTally]) -> str:
         percents = map(lambda item: item.txt, tally)
 
@@ -387,44 +750,189 @@ class Post:
         self,
         tally: Iterable[MemberVoteTally]
     ) -> None:
-        for item in tally:
+        # Every party shares the same run of small text blocks, with a bold
+        # heading line per party instead of a heading block each. A party
+        # starts a new block if it won't fit in what's left of the current
+        # one, and only gets split across blocks if it can't fit in any.
+        NL = '\n'
+        text = ''
+        formatting: list[NpfTextFormatting] = []
+
+        def flush() -> None:
+            nonlocal text, formatting
+            if len(text) == 0:
+                return
+
             self.content.append({
                 'type': 'text',
-                'text': '{} ({} vote{})'.format(
-                    item.party, len(item.members),
-                    's' if len(item.members) != 1 else ''
-                ),
-                'subtype': 'heading2',
+                'text': text,
+                'formatting': formatting,
             })
+            text = ''
+            formatting = []
+
+        def write(line: str, style: str) -> None:
+            nonlocal text
+            if len(text) > 0:
+                text += NL
+
+            start = len(text)
+            text += line
+
+            last = formatting[-1] if len(formatting) > 0 else None
+            if last and last['type'] == style and last['end'] == start - 1:
+                last['end'] = len(text)
+            else:
+                formatting.append(cast(NpfTextFormatting, {
+                    'start': start,
+                    'end': len(text),
+                    'type': style,
+                }))
+
+        for item in tally:
+            heading = '{} ({} vote{})'.format(
+                item.party, len(item.members),
+                's' if len(item.members) != 1 else ''
+            )
+            # Blank line to separate it from the party before
+            section_len = 2 * NL_LEN + len(heading) + sum(
+                NL_LEN + len(member.name) for member in item.members
+            )
+
+            if len(text) + section_len > TUMBLR_TEXT_BLOCK_LEN:
+                flush()
+
+            if len(text) > 0:
+                text += NL
+            write(heading, 'bold')
 
-            NL = '\n'
-            NL_LEN = len(NL)
-            members_list = ''
-            blocks = []
             for member in item.members:
-                final_len = len(members_list) + NL_LEN + len(member.name)
+                if len(member.name) > TUMBLR_TEXT_BLOCK_LEN:
+                    raise Exception(f'Member name too long: {member.name}')
+
+                final_len = len(text) + NL_LEN + len(member.name)
                 if final_len > TUMBLR_TEXT_BLOCK_LEN:
-                    if len(members_list) == 0:
-                        raise Exception(f'Member name too long: {member.name}')
-
-                    blocks.append(members_list)
-                    members_list = ''
-
-                if len(members_list) > 0:
-                    members_list += NL
-
-                members_list += member.name
-
-            if len(members_list) > 0:
-                blocks.append(members_list)
-
-            for members_list in blocks:
-                self.content.append({
-                    'type': 'text',
-                    'text': members_list,
-                    'formatting': [{
-                            'start': 0,
-                            'end': len(members_list),
-                            'type': 'small',
-                    }]
-                })
+                    flush()
+
+                write(member.name, 'small')
+
+        flush()
+
+    def parts(self) -> list[list[NpfContent]]:
+        # Split deterministically at block boundaries into a post plus as
+        # many continuation posts as it takes to stay under Tumblr's limits.
+        # Each continuation repeats the header so it makes sense on its own.
+        continued_header: list[NpfContent] = [
+            {
+                'type': 'text',
+                'text': '{} Vote (continued)'.format(self.house),
+                'subtype': 'heading1',
+            },
+            self.content[1],
+        ]
+        header_size = _payload_size(continued_header)
+
+        parts: list[list[NpfContent]] = []
+        part: list[NpfContent] = []
+        part_size = 0
+        for block in self.content:
+            block_size = _payload_size([block])
+            too_many = len(part) + 1 > TUMBLR_POST_BLOCK_LIMIT
+            too_big = part_size + block_size > TUMBLR_POST_PAYLOAD_LIMIT
+            if len(part) > len(continued_header) and (too_many or too_big):
+                parts.append(part)
+                part = list(continued_header)
+                part_size = header_size
+
+            part.append(block)
+            part_size += block_size
+
+        parts.append(part)
+        return parts
+
+
+class DigestPost:
+    def __init__(self, house: str, day: date) -> None:
+        self.house = house
+        self.day = day
+        self.divs: list[Div] = []
+        self.blocks: list[NpfContent] = []
+
+    def division(self, div: Div, vote_url: str) -> None:
+        # Title linking through to the full breakdown, then the tallies in
+        # the same compact form the full posts use
+        post = Post(div)
+        text = div.title + '\n'
+
+        text += 'Ayes: {} '.format(div.yes_count)
+        aye_small_start = len(text)
+        text += '({})'.format(post._vote_count_str(post._count_votes(div.yes)))
+        aye_small_end = len(text)
+
+        text += ', Noes: {} '.format(div.no_count)
+        noe_small_start = len(text)
+        text += '({})'.format(post._vote_count_str(post._count_votes(div.no)))
+        noe_small_end = len(text)
+
+        self.divs.append(div)
+        self.blocks.append({
+            'type': 'text',
+            'text': text,
+            'formatting': [
+                {
+                    'start': 0,
+                    'end': len(div.title),
+                    'type': 'bold',
+                },
+                {
+                    'start': 0,
+                    'end': len(div.title),
+                    'type': 'link',
+                    'url': vote_url,
+                },
+                {
+                    'start': aye_small_start,
+                    'end': aye_small_end,
+                    'type': 'small',
+                },
+                {
+                    'start': noe_small_start,
+                    'end': noe_small_end,
+                    'type': 'small',
+                },
+            ]
+        })
+
+    def parts(self) -> list[list[NpfContent]]:
+        chunks = self._chunks(self.blocks)
+
+        parts: list[list[NpfContent]] = []
+        for i, chunk in enumerate(chunks):
+            heading = '{} Votes: {}'.format(self.house, self.day.isoformat())
+            if len(chunks) > 1:
+                heading += ' (part {} of {})'.format(i + 1, len(chunks))
+
+            parts.append([{
+                'type': 'text',
+                'text': heading,
+                'subtype': 'heading1',
+            }, *chunk])
+
+        return parts
+
+    def after(self, last_id: int) -> 'DigestPost':
+        digest = DigestPost(self.house, self.day)
+        for div, block in zip(self.divs, self.blocks):
+            if div.id > last_id:
+                digest.divs.append(div)
+                digest.blocks.append(block)
+
+        return digest
+
+    def part_divs(self) -> list[list[Div]]:
+        return self._chunks(self.divs)
+
+    def _chunks(self, items: list) -> list[list]:
+        # Each part also needs a heading block
+        size = TUMBLR_POST_BLOCK_LIMIT - 1
+        return [items[i:i + size] for i in range(0, len(items), size)]